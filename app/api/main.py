@@ -1,43 +1,41 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel
+from typing import List, Optional
 from app.core.backtester import Backtester
-from app.core.explainer import Explainer
+from app.core.regime_segments import parse_date
+from app.core.result_store import ResultStore
+from app.core.feature_store import FeatureStore
 import pandas as pd
 
 app = FastAPI(title="Autonomous Adaptive Portfolio Engine")
+store = ResultStore()
+# Shared across uvicorn workers: features are computed once per price version
+feature_store = FeatureStore()
 
 class BacktestRequest(BaseModel):
     ticker: str
     start_date: str
     end_date: str
 
+class RegimeQuery(BacktestRequest):
+    date: Optional[str] = None
+    regime: Optional[str] = None
+
 @app.post("/backtest")
 def run_backtest(request: BacktestRequest):
     try:
-        # Run Strategy (With Risk Engine)
-        backtester = Backtester(request.ticker, request.start_date, request.end_date)
-        backtester.load_data()
-        results = backtester.run(use_risk_engine=True)
-        metrics = backtester.calculate_metrics(results)
-        
-        # Run Benchmark (Buy & Hold / Without Risk Engine)
-        results_bench = backtester.run(use_risk_engine=False)
-        metrics_bench = backtester.calculate_metrics(results_bench)
+        # Strategy (With Risk Engine) and Benchmark (Without Risk Engine),
+        # reused from the result store when the same inputs were run before
+        backtester = Backtester(request.ticker, request.start_date, request.end_date, feature_store=feature_store)
+        run = store.run_backtest(backtester)
+        results = run['results_strategy']
+        results_bench = run['results_benchmark']
+        metrics = run['metrics_strategy']
+        metrics_bench = run['metrics_benchmark']
+        segments = run['segments']
         
-        # Generate Explanation
-        explainer = Explainer()
-        # Get last state for explanation
-        if not results.empty:
-            last_row = results.iloc[-1]
-            last_regime = last_row['Regime']
-            last_alloc = {
-                'Equity': last_row['Equity_Weight'],
-                'Bonds': last_row['Bonds_Weight'],
-                'Cash': last_row['Cash_Weight']
-            }
-            explanation = explainer.explain(last_regime, last_alloc, metrics)
-        else:
-            explanation = "No data available."
+        # Generate Explanation (once per stored run)
+        explanation = store.ensure_explanation(run)
 
         # Convert simple types for JSON
         def clean_nan(obj):
@@ -46,15 +44,72 @@ def run_backtest(request: BacktestRequest):
             return obj
 
         return {
+            "run_key": run['key'],
+            "cached": run['cached'],
             "metrics_strategy": {k: clean_nan(v) for k, v in metrics.items()},
             "metrics_benchmark": {k: clean_nan(v) for k, v in metrics_bench.items()},
             "data_strategy": results.reset_index().to_dict(orient='records'),
             "data_benchmark": results_bench.reset_index().to_dict(orient='records'),
+            "regime_segments": segments.to_records(),
+            "regime_summary": segments.summary().to_dict(orient='records'),
             "explanation": explanation
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/regimes")
+def query_regimes(query: RegimeQuery):
+    if query.date is not None:
+        try:
+            parse_date(query.date)
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"Invalid date: {query.date}")
+    try:
+        # Answered from the stored segment arrays, not the full result frame
+        backtester = Backtester(query.ticker, query.start_date, query.end_date, feature_store=feature_store)
+        segments = store.run_segments(backtester)
+        
+        episodes = segments.episodes(query.regime)
+        episodes['Start'] = episodes['Start'].map(pd.Timestamp.isoformat)
+        episodes['End'] = episodes['End'].map(pd.Timestamp.isoformat)
+        
+        response = {
+            "segments": episodes.to_dict(orient='records'),
+            "summary": segments.summary().to_dict(orient='records'),
+        }
+        if query.date is not None:
+            response["active"] = segments.segment_at(query.date)
+        return response
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/runs")
+def list_runs():
+    return store.list_runs().to_dict(orient='records')
+
+@app.get("/runs/compare")
+def compare_runs(keys: List[str] = Query(...)):
+    return store.compare(keys).to_dict(orient='records')
+
+@app.get("/runs/{key}")
+def get_run(key: str):
+    run = store.load(key)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Run {key} not found")
+    return {
+        "run_key": key,
+        "ticker": run['ticker'],
+        "start_date": run['start_date'],
+        "end_date": run['end_date'],
+        "params": run['params'],
+        "metrics_strategy": run['metrics_strategy'],
+        "metrics_benchmark": run['metrics_benchmark'],
+        "data_strategy": run['results_strategy'].reset_index().to_dict(orient='records'),
+        "data_benchmark": run['results_benchmark'].reset_index().to_dict(orient='records'),
+        "regime_segments": run['segments'].to_records(),
+        "explanation": run['explanation']
+    }
+
 @app.get("/")
 def read_root():
     return {"status": "System Operational"}
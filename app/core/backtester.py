@@ -1,15 +1,19 @@
 import pandas as pd
 import numpy as np
-from app.core.data_loader import fetch_data, calculate_features
+from app.core.data_loader import fetch_data, calculate_features, price_fingerprint
 from app.core.regime_detector import RegimeDetector
 from app.core.allocation_engine import AllocationEngine
 from app.core.risk_manager import RiskManager
 
 class Backtester:
-    def __init__(self, ticker, start_date, end_date):
+    def __init__(self, ticker, start_date, end_date, regime_detector=None, risk_manager=None, allocator=None, feature_store=None):
         self.ticker = ticker
         self.start_date = start_date
         self.end_date = end_date
+        self.regime_detector = regime_detector or RegimeDetector()
+        self.risk_manager = risk_manager or RiskManager()
+        self.allocator = allocator or AllocationEngine()
+        self.feature_store = feature_store
         self.data = None
         self.features = None
         self.results = []
@@ -29,12 +33,19 @@ class Backtester:
         if isinstance(self.data, pd.DataFrame) and self.ticker in self.data.columns:
             self.data = self.data[self.ticker]
             
-        self.features = calculate_features(self.data)
+        if self.feature_store is not None:
+            # Shared read-only features, computed once per price version
+            self.features = self.feature_store.get_features(self.ticker, self.data)
+        else:
+            self.features = calculate_features(self.data)
         
     def run(self, use_risk_engine=True):
-        regime_detector = RegimeDetector()
-        allocator = AllocationEngine()
-        risk_manager = RiskManager()
+        regime_detector = self.regime_detector
+        allocator = self.allocator
+        risk_manager = self.risk_manager
+        
+        # Each run produces its own timeline
+        self.results = []
         
         # Portfolio Value
         portfolio_value = 10000.0
@@ -102,8 +113,23 @@ class Backtester:
                     'Cash_Weight': allocation['Cash']
                 })
                 
-        return pd.DataFrame(self.results).set_index('Date')
+        return pd.DataFrame(self.results).set_index('Date') if self.results else pd.DataFrame()
 
+    def params(self):
+        """
+        All parameters that influence a run (used to key stored results).
+        """
+        return {
+            type(component).__name__: dict(sorted(vars(component).items()))
+            for component in (self.regime_detector, self.risk_manager, self.allocator)
+        }
+        
+    def data_fingerprint(self):
+        """
+        Content hash of the loaded price series (dates and values).
+        """
+        return price_fingerprint(self.data)
+        
     def calculate_metrics(self, strategy_results):
         if strategy_results.empty:
             return {}
@@ -1,3 +1,4 @@
+import hashlib
 import yfinance as yf
 import pandas as pd
 import numpy as np
@@ -58,3 +59,12 @@ def calculate_features(data):
     features['Trend'] = np.where(data > features['SMA_200'], 1, 0)
     
     return features.dropna()
+
+def price_fingerprint(data):
+    """
+    Content hash of a price series (dates and values).
+    """
+    digest = hashlib.sha256()
+    digest.update(data.index.to_numpy(dtype='datetime64[ns]').tobytes())
+    digest.update(np.ascontiguousarray(data.to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
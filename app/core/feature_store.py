@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import shutil
+import uuid
+import warnings
+
+import pandas as pd
+import numpy as np
+
+from app.core.data_loader import calculate_features, price_fingerprint
+
+# Point at a tmpfs such as /dev/shm/feature_store to keep it in shared memory
+DEFAULT_STORE_DIR = os.getenv("FEATURE_STORE_DIR", os.path.join(os.getcwd(), ".feature_store"))
+
+# Bump when calculate_features changes so stale versions are not attached
+FEATURES_VERSION = 1
+
+# Versions kept per ticker; the least recently used beyond this are evicted
+MAX_VERSIONS = int(os.getenv("FEATURE_STORE_MAX_VERSIONS", "8"))
+
+
+class FeatureStore:
+    def __init__(self, root=None, max_versions=MAX_VERSIONS):
+        self.root = root or DEFAULT_STORE_DIR
+        self.max_versions = max_versions
+        os.makedirs(self.root, exist_ok=True)
+
+    def get_features(self, ticker, prices):
+        """
+        Returns the features for this exact price series, attaching to the
+        shared copy if one exists and computing/publishing it otherwise.
+        """
+        version = self.version_key(prices)
+        features = self.attach(ticker, version)
+        if features is not None:
+            return features
+
+        features = calculate_features(prices)
+        self._publish(ticker, version, prices, features)
+        attached = self.attach(ticker, version)
+        if attached is None:
+            # Invalidated meanwhile, or a leftover folder could not be replaced
+            warnings.warn(f"Feature store could not publish {ticker} {version}; using a private copy")
+            return features
+        return attached
+
+    def version_key(self, prices):
+        return self.version_for_fingerprint(price_fingerprint(prices))
+
+    def version_for_fingerprint(self, fingerprint):
+        return f"v{FEATURES_VERSION}-{fingerprint[:32]}"
+
+    def attach(self, ticker, version=None):
+        """
+        Zero-copy, read-only view of a stored feature frame (latest version
+        by default), or None if it is not in the store.
+        """
+        ticker_dir = self._ticker_dir(ticker)
+        if version is None:
+            latest = self._read_json(os.path.join(ticker_dir, "latest.json"))
+            if latest is None:
+                return None
+            version = latest["version"]
+
+        version_dir = os.path.join(ticker_dir, version)
+        meta = self._read_json(os.path.join(version_dir, "meta.json"))
+        if meta is None:
+            return None
+
+        try:
+            values = np.load(os.path.join(version_dir, "values.npy"), mmap_mode='r')
+            dates = np.load(os.path.join(version_dir, "Date.npy"), mmap_mode='r')
+        except FileNotFoundError:
+            # Removed by a concurrent invalidation
+            return None
+        self._touch(version_dir)
+        # A single float block backed by the mapped file, so no copy is made
+        return pd.DataFrame(values, index=pd.DatetimeIndex(dates, name=meta["index_name"]),
+                            columns=meta["columns"], copy=False)
+
+    def versions(self, ticker):
+        """
+        Metadata of every stored version for a ticker, least recently used first.
+        """
+        ticker_dir = self._ticker_dir(ticker)
+        if not os.path.isdir(ticker_dir):
+            return []
+        out = []
+        for name in os.listdir(ticker_dir):
+            # Skips latest.json, its temp files and unpublished scratch directories
+            version_dir = os.path.join(ticker_dir, name)
+            if not name.startswith("v") or not os.path.isdir(version_dir):
+                continue
+            meta = self._read_json(os.path.join(version_dir, "meta.json"))
+            try:
+                last_used = os.path.getmtime(version_dir)
+            except FileNotFoundError:
+                continue
+            if meta is not None:
+                meta["last_used"] = last_used
+                out.append(meta)
+        return sorted(out, key=lambda meta: meta["last_used"])
+
+    def invalidate(self, ticker, version=None):
+        """
+        Drops one version, or every version of a ticker.
+        """
+        ticker_dir = self._ticker_dir(ticker)
+        if version is None:
+            shutil.rmtree(ticker_dir, ignore_errors=True)
+            return
+        shutil.rmtree(os.path.join(ticker_dir, version), ignore_errors=True)
+        latest_path = os.path.join(ticker_dir, "latest.json")
+        latest = self._read_json(latest_path)
+        if latest is not None and latest["version"] == version:
+            try:
+                os.remove(latest_path)
+            except FileNotFoundError:
+                pass
+
+    def _publish(self, ticker, version, prices, features):
+        ticker_dir = self._ticker_dir(ticker)
+        version_dir = os.path.join(ticker_dir, version)
+        tmp_dir = os.path.join(ticker_dir, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+
+        meta = {
+            "ticker": ticker,
+            "version": version,
+            "price_start": str(prices.index[0]),
+            "price_end": str(prices.index[-1]),
+            "rows": len(features),
+            "columns": features.columns.tolist(),
+            "index_name": features.index.name,
+        }
+        np.save(os.path.join(tmp_dir, "values.npy"), features.to_numpy(dtype=float))
+        np.save(os.path.join(tmp_dir, "Date.npy"), features.index.to_numpy(dtype='datetime64[ns]'))
+        # meta.json is written last: readers treat its presence as "complete"
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        try:
+            os.rename(tmp_dir, version_dir)
+        except OSError:
+            if os.path.exists(os.path.join(version_dir, "meta.json")):
+                # Another worker published the same version first
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return
+            # Leftover of a removal that failed part-way (mapped files cannot
+            # be deleted on Windows): clear it and publish again
+            shutil.rmtree(version_dir, ignore_errors=True)
+            try:
+                os.rename(tmp_dir, version_dir)
+            except OSError:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return
+
+        # Prices were extended: the previous latest version (same start,
+        # earlier end) is stale, so drop it and point latest at this one
+        latest_path = os.path.join(ticker_dir, "latest.json")
+        latest = self._read_json(latest_path)
+        if latest is None or latest["price_end"] <= meta["price_end"]:
+            if (latest is not None and latest["version"] != version
+                    and latest["price_start"] == meta["price_start"]):
+                shutil.rmtree(os.path.join(ticker_dir, latest["version"]), ignore_errors=True)
+            self._write_json(latest_path, {"version": version, "price_start": meta["price_start"],
+                                           "price_end": meta["price_end"]})
+        self._evict(ticker, keep=version)
+
+    def _evict(self, ticker, keep):
+        """
+        Drops the least recently used versions beyond max_versions, never
+        the latest one or the one just published.
+        """
+        latest = self._read_json(os.path.join(self._ticker_dir(ticker), "latest.json"))
+        protected = {keep, latest["version"] if latest is not None else None}
+        candidates = [meta for meta in self.versions(ticker) if meta["version"] not in protected]
+        excess = len(candidates) + len(protected - {None}) - self.max_versions
+        for meta in candidates[:max(excess, 0)]:
+            shutil.rmtree(os.path.join(self._ticker_dir(ticker), meta["version"]), ignore_errors=True)
+
+    def _touch(self, version_dir):
+        # Directory mtime doubles as the last-used time for eviction
+        try:
+            os.utime(version_dir)
+        except OSError:
+            pass
+
+    def _ticker_dir(self, ticker):
+        return os.path.join(self.root, re.sub(r"[^A-Za-z0-9._-]", "_", ticker))
+
+    def _read_json(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_json(self, path, payload):
+        # Write-then-rename so concurrent readers never see a partial file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,152 @@
+import pandas as pd
+import numpy as np
+
+# Fixed code table so segment arrays can be stored as small integers
+REGIMES = ("Bullish", "Bearish", "High Volatility", "Crash")
+
+SEGMENT_FIELDS = ("starts", "ends", "codes", "lengths", "returns")
+
+
+def parse_date(value):
+    """
+    Parses a lookup date. Raises ValueError for unparseable or missing (NaT) input.
+    """
+    ts = pd.Timestamp(value)
+    if pd.isna(ts):
+        raise ValueError(f"Invalid date: {value!r}")
+    return ts.tz_localize(None)
+
+
+class RegimeSegmentIndex:
+    def __init__(self, starts, ends, codes, lengths, returns, regimes=REGIMES):
+        self.starts = starts      # datetime64[ns], first date of each spell
+        self.ends = ends          # datetime64[ns], last date of each spell
+        self.codes = codes        # int8, index into self.regimes
+        self.lengths = lengths    # int32, number of rows in each spell
+        self.returns = returns    # float64, portfolio return over each spell
+        self.regimes = tuple(regimes)
+
+    @classmethod
+    def from_results(cls, results, initial_value=10000.0):
+        """
+        Builds a run-length encoded index from a backtest results frame
+        (Date index, 'Regime' and 'Value' columns). `initial_value` is the
+        portfolio value before the first row (the Backtester's starting capital).
+        """
+        if results is None or results.empty:
+            empty = np.array([], dtype='datetime64[ns]')
+            return cls(empty, empty.copy(), np.array([], dtype=np.int8),
+                       np.array([], dtype=np.int32), np.array([], dtype=float))
+
+        regimes = list(REGIMES)
+        for label in pd.unique(results['Regime']):
+            if label not in regimes:
+                regimes.append(label)
+        lookup = {label: code for code, label in enumerate(regimes)}
+
+        row_codes = results['Regime'].map(lookup).to_numpy(dtype=np.int8)
+        dates = results.index.to_numpy(dtype='datetime64[ns]')
+        values = results['Value'].to_numpy(dtype=float)
+
+        # A new spell starts wherever the regime code changes
+        change = np.flatnonzero(row_codes[1:] != row_codes[:-1]) + 1
+        start_pos = np.concatenate(([0], change))
+        end_pos = np.concatenate((change - 1, [len(row_codes) - 1]))
+
+        # Spell return is measured from the close before the spell began
+        base = np.concatenate(([initial_value], values[end_pos[:-1]]))
+        returns = values[end_pos] / base - 1
+
+        return cls(
+            dates[start_pos],
+            dates[end_pos],
+            row_codes[start_pos],
+            (end_pos - start_pos + 1).astype(np.int32),
+            returns,
+            regimes,
+        )
+
+    def __len__(self):
+        return len(self.codes)
+
+    def regime_at(self, date):
+        """
+        Returns the regime active on `date` (O(log n)), or None if the date
+        falls outside the backtest window.
+        """
+        pos = self._locate(date)
+        return None if pos is None else self.regimes[self.codes[pos]]
+
+    def segment_at(self, date):
+        """
+        Returns the full segment record active on `date`, or None.
+        """
+        pos = self._locate(date)
+        return None if pos is None else self._record(pos)
+
+    def episodes(self, regime=None):
+        """
+        Returns all spells as a DataFrame, optionally filtered to one regime.
+        """
+        df = self.to_frame()
+        if regime is not None:
+            df = df[df['Regime'] == regime].reset_index(drop=True)
+        return df
+
+    def summary(self):
+        """
+        Aggregates spells per regime: number of spells, total days,
+        mean spell length and mean/compounded spell return.
+        """
+        n = len(self.regimes)
+        spells = np.bincount(self.codes, minlength=n)
+        days = np.bincount(self.codes, weights=self.lengths, minlength=n)
+        ret_sum = np.bincount(self.codes, weights=self.returns, minlength=n)
+        log_growth = np.bincount(self.codes, weights=np.log1p(self.returns), minlength=n)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_len = np.where(spells > 0, days / spells, np.nan)
+            mean_ret = np.where(spells > 0, ret_sum / spells, np.nan)
+
+        df = pd.DataFrame({
+            'Regime': list(self.regimes),
+            'Spells': spells,
+            'Days': days.astype(int),
+            'Avg_Days': mean_len,
+            'Avg_Return': mean_ret,
+            'Total_Return': np.expm1(log_growth),
+        })
+        return df[df['Spells'] > 0].reset_index(drop=True)
+
+    def to_frame(self):
+        return pd.DataFrame({
+            'Start': pd.to_datetime(self.starts),
+            'End': pd.to_datetime(self.ends),
+            'Regime': [self.regimes[c] for c in self.codes],
+            'Days': self.lengths,
+            'Return': self.returns,
+        })
+
+    def to_records(self):
+        """
+        JSON-friendly list of segments for the API.
+        """
+        return [self._record(i) for i in range(len(self))]
+
+    def _locate(self, date):
+        ts = np.datetime64(parse_date(date), 'ns')
+        if len(self) == 0:
+            return None
+        pos = np.searchsorted(self.starts, ts, side='right') - 1
+        if pos < 0 or ts > self.ends[-1]:
+            return None
+        return int(pos)
+
+    def _record(self, pos):
+        return {
+            'Start': pd.Timestamp(self.starts[pos]).isoformat(),
+            'End': pd.Timestamp(self.ends[pos]).isoformat(),
+            'Regime': self.regimes[self.codes[pos]],
+            'Days': int(self.lengths[pos]),
+            'Return': float(self.returns[pos]),
+        }
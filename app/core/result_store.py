@@ -0,0 +1,330 @@
+import os
+import json
+import shutil
+import sqlite3
+import hashlib
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+import numpy as np
+
+from app.core.regime_segments import REGIMES, SEGMENT_FIELDS, RegimeSegmentIndex
+
+DEFAULT_STORE_DIR = os.getenv("RESULT_STORE_DIR", os.path.join(os.getcwd(), ".result_store"))
+
+# Bump when the simulation logic changes so old runs are not reused
+STORE_VERSION = 1
+
+SERIES = ("strategy", "benchmark")
+COLUMNS = ("Value", "Equity_Weight", "Bonds_Weight", "Cash_Weight")
+
+
+class ResultStore:
+    def __init__(self, root=None):
+        self.root = root or DEFAULT_STORE_DIR
+        self.arrays_dir = os.path.join(self.root, "runs")
+        os.makedirs(self.arrays_dir, exist_ok=True)
+        self.db_path = os.path.join(self.root, "runs.sqlite")
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    key TEXT PRIMARY KEY,
+                    ticker TEXT NOT NULL,
+                    start_date TEXT NOT NULL,
+                    end_date TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    regimes TEXT NOT NULL,
+                    metrics_strategy TEXT NOT NULL,
+                    metrics_benchmark TEXT NOT NULL,
+                    explanation TEXT,
+                    created_at TEXT NOT NULL,
+                    empty_series TEXT NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        # sqlite3's own context manager only commits; also close the connection
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def run_key(self, backtester):
+        """
+        Content address of a run: ticker, date range, price fingerprint and
+        every RegimeDetector/RiskManager/AllocationEngine parameter.
+        """
+        payload = {
+            "version": STORE_VERSION,
+            "ticker": backtester.ticker,
+            "start_date": str(backtester.start_date),
+            "end_date": str(backtester.end_date),
+            "fingerprint": backtester.data_fingerprint(),
+            "params": backtester.params(),
+        }
+        blob = json.dumps(payload, sort_keys=True, default=str).encode()
+        return hashlib.sha256(blob).hexdigest()
+
+    def save(self, key, backtester, results, results_bench, metrics, metrics_bench, explanation=None):
+        """
+        Writes both result frames and the strategy's regime segment index as
+        .npy arrays, records the run metadata and returns the segment index.
+        """
+        regimes = list(REGIMES)
+        for frame in (results, results_bench):
+            if not frame.empty:
+                for label in pd.unique(frame['Regime']):
+                    if label not in regimes:
+                        regimes.append(label)
+        lookup = {label: code for code, label in enumerate(regimes)}
+
+        # Write into a private scratch directory first so readers never see half a run
+        final_dir = os.path.join(self.arrays_dir, key)
+        tmp_dir = os.path.join(self.arrays_dir, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        empty_series = []
+        for series, frame in zip(SERIES, (results, results_bench)):
+            if frame.empty:
+                empty_series.append(series)
+                continue
+            np.save(os.path.join(tmp_dir, f"{series}_Date.npy"), frame.index.to_numpy(dtype='datetime64[ns]'))
+            np.save(os.path.join(tmp_dir, f"{series}_Regime.npy"), frame['Regime'].map(lookup).to_numpy(dtype=np.int8))
+            for col in COLUMNS:
+                np.save(os.path.join(tmp_dir, f"{series}_{col}.npy"), frame[col].to_numpy(dtype=float))
+
+        # Regime timeline, built once at the end of the run and stored with it
+        segments = RegimeSegmentIndex.from_results(results)
+        remap = np.array([lookup[label] for label in segments.regimes], dtype=np.int8)
+        segments = RegimeSegmentIndex(segments.starts, segments.ends, remap[segments.codes],
+                                      segments.lengths, segments.returns, regimes)
+        for field in SEGMENT_FIELDS:
+            np.save(os.path.join(tmp_dir, f"segments_{field}.npy"), getattr(segments, field))
+        try:
+            os.rename(tmp_dir, final_dir)
+        except OSError:
+            if not _has_files(final_dir, os.listdir(tmp_dir)):
+                # Leftover of a damaged run (e.g. a delete that failed part-way): replace it
+                shutil.rmtree(final_dir, ignore_errors=True)
+                try:
+                    os.rename(tmp_dir, final_dir)
+                except OSError:
+                    pass
+            # Otherwise another worker published the same run first; its arrays are identical
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        # Keyed by content, so the first row written wins (and keeps its explanation)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO runs (key, ticker, start_date, end_date, fingerprint, params, regimes, "
+                "metrics_strategy, metrics_benchmark, explanation, created_at, empty_series) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    backtester.ticker,
+                    str(backtester.start_date),
+                    str(backtester.end_date),
+                    backtester.data_fingerprint(),
+                    json.dumps(backtester.params(), sort_keys=True, default=str),
+                    json.dumps(regimes),
+                    json.dumps(_clean(metrics)),
+                    json.dumps(_clean(metrics_bench)),
+                    explanation,
+                    datetime.now(timezone.utc).isoformat(),
+                    json.dumps(empty_series),
+                ),
+            )
+        return segments
+
+    def run_backtest(self, backtester):
+        """
+        Returns the stored run for this backtester's inputs, running and
+        saving both the strategy and the benchmark on a miss.
+        """
+        if backtester.data is None:
+            backtester.load_data()
+        key = self.run_key(backtester)
+
+        run = self.load(key)
+        if run is not None:
+            run["cached"] = True
+            return run
+
+        results = backtester.run(use_risk_engine=True)
+        metrics = backtester.calculate_metrics(results)
+        results_bench = backtester.run(use_risk_engine=False)
+        metrics_bench = backtester.calculate_metrics(results_bench)
+        segments = self.save(key, backtester, results, results_bench, metrics, metrics_bench)
+
+        run = self.get_meta(key)
+        run["results_strategy"] = results
+        run["results_benchmark"] = results_bench
+        run["segments"] = segments
+        run["cached"] = False
+        return run
+
+    def run_segments(self, backtester):
+        """
+        Returns only the stored regime segment index for this backtester's
+        inputs, running the backtest on a miss.
+        """
+        if backtester.data is None:
+            backtester.load_data()
+        segments = self.load_segments(self.run_key(backtester))
+        if segments is None:
+            segments = self.run_backtest(backtester)["segments"]
+        return segments
+
+    def load_segments(self, key):
+        """
+        Memory-maps a stored run's regime segment index, or None.
+        """
+        meta = self.get_meta(key)
+        if meta is None:
+            return None
+        arrays = {field: self.load_array(key, "segments", field) for field in SEGMENT_FIELDS}
+        if any(arr is None for arr in arrays.values()):
+            self.delete(key)
+            return None
+        return RegimeSegmentIndex(regimes=meta["regimes"], **arrays)
+
+    def set_explanation(self, key, explanation):
+        with self._connect() as conn:
+            conn.execute("UPDATE runs SET explanation = ? WHERE key = ?", (explanation, key))
+
+    def ensure_explanation(self, run):
+        """
+        Returns the run's explanation, generating and storing it on first use.
+        """
+        if run['explanation'] is None:
+            from app.core.explainer import Explainer
+            results = run['results_strategy']
+            # Get last state for explanation
+            if not results.empty:
+                last_row = results.iloc[-1]
+                last_alloc = {
+                    'Equity': last_row['Equity_Weight'],
+                    'Bonds': last_row['Bonds_Weight'],
+                    'Cash': last_row['Cash_Weight']
+                }
+                run['explanation'] = Explainer().explain(last_row['Regime'], last_alloc, run['metrics_strategy'])
+            else:
+                run['explanation'] = "No data available."
+            self.set_explanation(run['key'], run['explanation'])
+        return run['explanation']
+
+    def load_array(self, key, series, column):
+        """
+        Memory-maps a single stored column (read-only), or returns None.
+        """
+        path = os.path.join(self.arrays_dir, key, f"{series}_{column}.npy")
+        try:
+            return np.load(path, mmap_mode='r')
+        except FileNotFoundError:
+            return None
+
+    def load(self, key):
+        """
+        Returns a stored run as a dict (metadata plus result frames), or None
+        if the run is unknown. A run with missing arrays is damaged: it is
+        deleted so the next run_backtest() recomputes and republishes it.
+        """
+        meta = self.get_meta(key)
+        if meta is None:
+            return None
+
+        regimes = meta["regimes"]
+        for series in SERIES:
+            if series in meta["empty_series"]:
+                meta[f"results_{series}"] = pd.DataFrame()
+                continue
+            arrays = {col: self.load_array(key, series, col) for col in ("Date", "Regime") + COLUMNS}
+            if any(arr is None for arr in arrays.values()):
+                self.delete(key)
+                return None
+            index = pd.DatetimeIndex(arrays.pop("Date"), name='Date')
+            codes = arrays.pop("Regime")
+            # One Series per column keeps each float column backed by its mapped file
+            frame = pd.DataFrame(
+                {col: pd.Series(arr, index=index, copy=False) for col, arr in arrays.items()},
+                copy=False,
+            )
+            frame.insert(1, 'Regime', pd.Categorical.from_codes(codes, categories=regimes).astype(object))
+            meta[f"results_{series}"] = frame
+
+        meta["segments"] = self.load_segments(key)
+        if meta["segments"] is None:
+            return None
+        return meta
+
+    def get_meta(self, key):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM runs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        meta = dict(row)
+        for field in ("params", "regimes", "metrics_strategy", "metrics_benchmark", "empty_series"):
+            meta[field] = json.loads(meta[field])
+        return meta
+
+    def list_runs(self):
+        """
+        All stored runs, newest first, with strategy metrics flattened into columns.
+        """
+        with self._connect() as conn:
+            df = pd.read_sql_query(
+                "SELECT key, ticker, start_date, end_date, metrics_strategy, created_at "
+                "FROM runs ORDER BY created_at DESC",
+                conn,
+            )
+        metrics = pd.DataFrame([json.loads(m) for m in df.pop('metrics_strategy')], index=df.index)
+        # Runs shorter than the warm-up have no metrics; keep them JSON-safe
+        return _nan_to_none(pd.concat([df, metrics], axis=1))
+
+    def compare(self, keys):
+        """
+        Side-by-side strategy and benchmark metrics for the given runs.
+        """
+        rows = []
+        for key in keys:
+            meta = self.get_meta(key)
+            if meta is None:
+                continue
+            row = {"key": key, "ticker": meta["ticker"], "start_date": meta["start_date"], "end_date": meta["end_date"]}
+            row.update({f"Strategy {k}": v for k, v in meta["metrics_strategy"].items()})
+            row.update({f"Benchmark {k}": v for k, v in meta["metrics_benchmark"].items()})
+            rows.append(row)
+        return _nan_to_none(pd.DataFrame(rows))
+
+    def delete(self, key):
+        shutil.rmtree(os.path.join(self.arrays_dir, key), ignore_errors=True)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM runs WHERE key = ?", (key,))
+
+
+def _has_files(path, names):
+    try:
+        return set(names) <= set(os.listdir(path))
+    except FileNotFoundError:
+        return False
+
+
+def _nan_to_none(df):
+    return df.astype(object).where(pd.notna(df), None)
+
+
+def _clean(metrics):
+    # JSON has no NaN/inf; store them as null
+    out = {}
+    for k, v in metrics.items():
+        v = float(v)
+        out[k] = None if (v != v or v in (float('inf'), float('-inf'))) else v
+    return out
@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import requests
 import plotly.express as px
 import plotly.graph_objects as go
@@ -9,8 +10,138 @@ import os
 # Add root directory to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
+from app.core.backtester import Backtester
+from app.core.result_store import ResultStore
+from app.core.feature_store import FeatureStore
+
 st.set_page_config(page_title="Autonomous Portfolio Engine", layout="wide")
 
+# Partial reruns: widgets inside a fragment only rerun that fragment.
+# Older Streamlit versions only have the experimental name (or neither).
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+# Max points per plotted series; longer histories are decimated
+MAX_POINTS = 2000
+
+REGIME_COLORS = {'Bullish': 'green', 'Bearish': 'orange', 'High Volatility': 'purple', 'Crash': 'red'}
+
+
+# --- Cached Computations (keyed on inputs / run key) ---
+
+@st.cache_resource
+def get_store():
+    return ResultStore()
+
+@st.cache_resource
+def get_feature_store():
+    return FeatureStore()
+
+@st.cache_data(show_spinner=False, ttl=3600)
+def load_simulation(ticker, start_date, end_date):
+    """
+    Runs (or reuses a stored) backtest for the given inputs. Features are
+    published to the feature store as a side effect, see attached_features().
+    """
+    backtester = Backtester(ticker, start_date, end_date, feature_store=get_feature_store())
+    backtester.load_data()
+    run = get_store().run_backtest(backtester)
+    get_store().ensure_explanation(run)
+    return run
+
+@st.cache_data(show_spinner=False)
+def load_stored_run(key):
+    run = get_store().load(key)
+    if run is not None:
+        get_store().ensure_explanation(run)
+    return run
+
+def attached_features(run):
+    """
+    Shared mmap-backed features for the run's price version. Deliberately not
+    cached: st.cache_data would pickle a private copy. None if evicted.
+    """
+    feature_store = get_feature_store()
+    return feature_store.attach(run['ticker'], feature_store.version_for_fingerprint(run['fingerprint']))
+
+def decimate(series, max_points=MAX_POINTS):
+    """
+    Min/max decimation: keeps each bucket's extremes so drawdowns survive.
+    """
+    n = len(series)
+    if n <= max_points:
+        return series
+    bucket = int(np.ceil(n / (max_points // 2)))
+    values = series.to_numpy(dtype=float)
+    padded = np.concatenate([values, np.full((-n) % bucket, np.nan)]).reshape(-1, bucket)
+    offsets = np.arange(padded.shape[0]) * bucket
+    keep = np.concatenate([
+        offsets + np.nanargmin(padded, axis=1),
+        offsets + np.nanargmax(padded, axis=1),
+        [0, n - 1],
+    ])
+    return series.iloc[np.unique(keep)]
+
+@st.cache_data(show_spinner=False)
+def performance_figure(run_key, _res_strat, _res_bench):
+    strat = decimate(_res_strat['Value'])
+    bench = decimate(_res_bench['Value'])
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(x=strat.index, y=strat.values, name="Adaptive Engine", line=dict(color='green', width=2)))
+    fig.add_trace(go.Scattergl(x=bench.index, y=bench.values, name="Benchmark (No Risk Engine)", line=dict(color='gray', dash='dash')))
+    return fig
+
+@st.cache_data(show_spinner=False)
+def allocation_figure(run_key, _res_strat):
+    # Stacked areas are not supported by WebGL traces, so stride-decimate instead
+    step = max(1, int(np.ceil(len(_res_strat) / MAX_POINTS)))
+    df = _res_strat.iloc[::step]
+    fig = go.Figure()
+    for col, color in [('Equity_Weight', 'green'), ('Bonds_Weight', 'blue'), ('Cash_Weight', 'gray')]:
+        fig.add_trace(go.Scatter(x=df.index, y=df[col], name=col, stackgroup='one', line=dict(color=color, width=0.5)))
+    fig.update_layout(title="Dynamic Asset Allocation Over Time")
+    return fig
+
+@st.cache_data(show_spinner=False)
+def regime_timeline(run_key, _segments):
+    """
+    Returns (timeline figure, per-regime summary) or (None, None).
+    """
+    if len(_segments) == 0:
+        return None, None
+    seg_df = _segments.to_frame()
+    # Bars run up to the next spell's start so single-day spells stay visible
+    seg_df['Bar_End'] = seg_df['Start'].shift(-1)
+    seg_df.loc[seg_df.index[-1], 'Bar_End'] = seg_df['End'].iloc[-1] + pd.offsets.BDay(1)
+    fig = px.timeline(seg_df, x_start='Start', x_end='Bar_End', y='Regime', color='Regime',
+                      hover_data=['Days', 'Return'], title="Regime Timeline",
+                      color_discrete_map=REGIME_COLORS)
+    return fig, _segments.summary()
+
+@st.cache_resource(show_spinner=False)
+def shap_figure(run_key, _features, _res_strat):
+    """
+    Trains the XAI surrogate once per run and plots the last decision.
+    """
+    from app.core.xai_engine import XAIEngine
+
+    # Features known at the close before each decision, aligned on the result dates
+    feat_df = _features.shift(1).dropna()
+    common_dates = _res_strat.index.intersection(feat_df.index)
+    if len(common_dates) == 0:
+        return None
+    feat_df = feat_df.loc[common_dates]
+    regimes_list = _res_strat.loc[common_dates, 'Regime'].tolist()
+
+    xai = XAIEngine()
+    xai.train_surrogate(feat_df, regimes_list)
+
+    last_date = _res_strat.index[-1]
+    if last_date not in feat_df.index:
+        return None
+    # Use iloc[0:1] to ensure we pass exactly one row as DataFrame
+    return xai.get_shap_plot(feat_df.loc[[last_date]].iloc[0:1])
+
+
 st.title("🧠 Autonomous Adaptive Portfolio & Risk Engine")
 st.markdown("### AI-Driven | Regime-Aware | Volatility-Targeting")
 
@@ -25,181 +156,145 @@ if 'sim_run' not in st.session_state:
     st.session_state.sim_run = False
 if 'data' not in st.session_state:
     st.session_state.data = None
-if 'backtester_features' not in st.session_state:
-    st.session_state.backtester_features = None
+
+def reset_crisis():
+    st.session_state.crisis_simulated = False
+    st.session_state.crisis_msg = ""
 
 if st.sidebar.button("Run Simulation"):
     st.session_state.sim_run = True
     # Reset crisis state on new run
-    st.session_state.crisis_simulated = False
-    st.session_state.crisis_msg = ""
-    
+    reset_crisis()
+
     with st.spinner("Crunching numbers... Detecting Regimes... Allocating Capital..."):
         try:
             # FORCE LOCAL EXECUTION for Hackathon Demo
             # This ensures XAI (SHAP) has access to the raw DataFrames/Models which is hard via API.
-            from app.core.backtester import Backtester
-            from app.core.explainer import Explainer
-            
-            backtester = Backtester(ticker, str(start_date), str(end_date))
-            backtester.load_data()
-            
-            # Store features in session state for XAI
-            st.session_state.backtester_features = backtester.features
-            
-            res_strat = backtester.run(use_risk_engine=True)
-            met_strat = backtester.calculate_metrics(res_strat)
-            
-            res_bench = backtester.run(use_risk_engine=False)
-            met_bench = backtester.calculate_metrics(res_bench)
-            
-            explainer = Explainer()
-            if not res_strat.empty:
-                last_row = res_strat.iloc[-1]
-                explanation = explainer.explain(last_row['Regime'], 
-                                                {'Equity': last_row['Equity_Weight'], 'Bonds': last_row['Bonds_Weight'], 'Cash': last_row['Cash_Weight']},
-                                                met_strat)
-            else:
-                explanation = "No data."
-            
-            st.session_state.data = {
-                "metrics_strategy": met_strat,
-                "metrics_benchmark": met_bench,
-                "data_strategy": res_strat.reset_index().to_dict(orient='records'),
-                "data_benchmark": res_bench.reset_index().to_dict(orient='records'),
-                "explanation": explanation
-            }
-            
+            st.session_state.data = load_simulation(ticker, str(start_date), str(end_date))
+
         except Exception as e:
             st.error(f"An error occurred: {e}")
             st.session_state.sim_run = False
 
-# Main Rendering Logic
-if st.session_state.sim_run and st.session_state.data:
-    data = st.session_state.data
-    
-    # Process Data
-    df_strat = pd.DataFrame(data['data_strategy'])
-    df_bench = pd.DataFrame(data['data_benchmark'])
-    
-    # Handle date conversion if needed (dict to datetime)
-    if 'Date' in df_strat.columns:
-        df_strat['Date'] = pd.to_datetime(df_strat['Date'])
-    if 'Date' in df_bench.columns:
-        df_bench['Date'] = pd.to_datetime(df_bench['Date'])
-    
-    # --- Results ---
-    
-    # 1. Performance Overview
-    col1, col2, col3 = st.columns(3)
-    col1.metric("Strategy CAGR", f"{data['metrics_strategy']['CAGR']:.2%}")
-    col2.metric("Max Drawdown", f"{data['metrics_strategy']['Max Drawdown']:.2%}")
-    col3.metric("Sharpe Ratio", f"{data['metrics_strategy']['Sharpe Ratio']:.2f}")
-
-    # 2. Equity Curve Comparison
-    st.subheader("Performance Comparison")
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=df_strat['Date'], y=df_strat['Value'], name="Adaptive Engine", line=dict(color='green', width=2)))
-    fig.add_trace(go.Scatter(x=df_bench['Date'], y=df_bench['Value'], name="Benchmark (No Risk Engine)", line=dict(color='gray', dash='dash')))
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # 3. Regime & Allocation
-    st.subheader("Regime Detection & Asset Allocation")
-    
-    fig_alloc = px.area(df_strat, x='Date', y=['Equity_Weight', 'Bonds_Weight', 'Cash_Weight'], 
-                        title="Dynamic Asset Allocation Over Time",
-                        color_discrete_map={'Equity_Weight': 'green', 'Bonds_Weight': 'blue', 'Cash_Weight': 'gray'})
-    st.plotly_chart(fig_alloc, use_container_width=True)
-
-    # --- INNOVATION SECTION: Transparent Brain (XAI) ---
-    st.markdown("---")
-    st.header("🧠 Transparent Brain (Explainable AI)")
-    
-    if st.session_state.backtester_features is not None:
-        from app.core.xai_engine import XAIEngine
-        import matplotlib.pyplot as plt
-        
-        # st.write("Training Surrogate Model...")
-        xai = XAIEngine()
-        
-        # Reconstruct alignment
-        feat_df = st.session_state.backtester_features.shift(1).dropna()
-        common_dates = df_strat['Date'].tolist()
-        feat_df = feat_df[feat_df.index.isin(common_dates)]
-        regimes_list = df_strat[df_strat['Date'].isin(feat_df.index)]['Regime'].tolist()
-        
-        if len(feat_df) > 0:
-            xai.train_surrogate(feat_df, regimes_list)
-            
-            last_date = df_strat['Date'].iloc[-1]
-            if last_date in feat_df.index:
-                # Use iloc[0:1] to ensure we pass exactly one row as DataFrame
-                last_feat_row = feat_df.loc[[last_date]].iloc[0:1]
-                fig_shap = xai.get_shap_plot(last_feat_row)
-                
-                col_xai_1, col_xai_2 = st.columns([2, 1])
-                with col_xai_1:
-                    st.subheader("Why did the AI choose this Regime?")
-                    if fig_shap:
-                        st.pyplot(fig_shap)
-                with col_xai_2:
-                    st.info(f"**Current Regime:** {data['explanation']}")
-    else:
-        st.warning("Feature data missing for XAI.")
+# Past Runs (served from the result store, no recomputation)
+past_runs = get_store().list_runs()
+if not past_runs.empty:
+    with st.sidebar.expander("Past Runs"):
+        labels = {row.key: f"{row.ticker} {row.start_date} → {row.end_date} ({row.key[:8]})" for row in past_runs.itertuples()}
+        selected = st.multiselect("Select runs", list(labels), format_func=labels.get)
+        if selected and st.button("Load First Selected"):
+            run = load_stored_run(selected[0])
+            if run is not None:
+                st.session_state.sim_run = True
+                reset_crisis()
+                st.session_state.data = run
+    if len(selected) > 1:
+        st.subheader("Run Comparison")
+        st.dataframe(get_store().compare(selected), use_container_width=True)
 
-    # --- INNOVATION SECTION: Crisis Lab ---
-    st.markdown("---")
-    st.header("🧪 Crisis Lab (Interactive Stress Test)")
-    
+@fragment
+def crisis_lab(curr_eq, curr_cash):
     # Initialize Session State for Crisis (if not exists)
     if 'crisis_simulated' not in st.session_state:
         st.session_state.crisis_simulated = False
         st.session_state.crisis_impact = 0.0
         st.session_state.crisis_msg = ""
-    
+
     with st.expander("Running a Crisis Simulation...", expanded=True):
         shock_val = st.slider("Inject Immediate Market Shock (%)", -20.0, 5.0, -5.0)
         vol_spike = st.slider("Inject Volatility Spike (Multiplier)", 1.0, 5.0, 2.0)
-        
+
         if st.button("Simulate Crisis Reaction"):
-            # CURRENT Allocation
-            curr_eq = df_strat['Equity_Weight'].iloc[-1]
-            curr_cash = df_strat['Cash_Weight'].iloc[-1]
-            
             # Impact
             loss = curr_eq * (shock_val / 100.0)
-            
+
             st.session_state.crisis_impact = loss
             st.session_state.crisis_simulated = True
-            
+
             # Response Logic
-            if vol_spike > 1.5: 
+            if vol_spike > 1.5:
                 st.session_state.crisis_msg = "⚠️ HIGH VOLATILITY DETECTED! Cutting Equity Exposure."
-                st.session_state.crisis_new_eq = 0.10 
-                st.session_state.crisis_new_cash = 0.80 
+                st.session_state.crisis_new_eq = 0.10
+                st.session_state.crisis_new_cash = 0.80
             else:
                 st.session_state.crisis_msg = "Risk within limits. Holding positions."
                 st.session_state.crisis_new_eq = curr_eq
                 st.session_state.crisis_new_cash = curr_cash
-        
+
         # Display Results
         if st.session_state.crisis_simulated:
             st.write(f"**Immediate Impact:** Portfolio Value changes by {st.session_state.crisis_impact:.2%}")
-            
+
             st.subheader("AI Engine Reaction:")
             if "Cutting Equity" in st.session_state.crisis_msg:
                 st.error(st.session_state.crisis_msg)
-                
-                curr_eq_display = df_strat['Equity_Weight'].iloc[-1] * 100
-                curr_cash_display = df_strat['Cash_Weight'].iloc[-1] * 100
+
+                curr_eq_display = curr_eq * 100
+                curr_cash_display = curr_cash * 100
                 new_eq_display = st.session_state.crisis_new_eq * 100
                 new_cash_display = st.session_state.crisis_new_cash * 100
-                
+
                 col_c1, col_c2 = st.columns(2)
                 col_c1.metric("Projected Equity Allocation", f"{new_eq_display:.1f}%", f"{new_eq_display - curr_eq_display:.1f}%")
                 col_c2.metric("Projected Cash Allocation", f"{new_cash_display:.1f}%", f"{new_cash_display - curr_cash_display:.1f}%")
             else:
                 st.success(st.session_state.crisis_msg)
 
+# Main Rendering Logic
+if st.session_state.sim_run and st.session_state.data:
+    data = st.session_state.data
+    run_key = data['key']
+    res_strat = data['results_strategy']
+    res_bench = data['results_benchmark']
+
+    # --- Results ---
+
+    # 1. Performance Overview
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Strategy CAGR", f"{data['metrics_strategy']['CAGR']:.2%}")
+    col2.metric("Max Drawdown", f"{data['metrics_strategy']['Max Drawdown']:.2%}")
+    col3.metric("Sharpe Ratio", f"{data['metrics_strategy']['Sharpe Ratio']:.2f}")
+
+    # 2. Equity Curve Comparison
+    st.subheader("Performance Comparison")
+    st.plotly_chart(performance_figure(run_key, res_strat, res_bench), use_container_width=True)
+
+    # 3. Regime & Allocation
+    st.subheader("Regime Detection & Asset Allocation")
+    st.plotly_chart(allocation_figure(run_key, res_strat), use_container_width=True)
+
+    # Regime Timeline (one bar per spell instead of one label per day)
+    fig_timeline, summary = regime_timeline(run_key, data['segments'])
+    if fig_timeline is not None:
+        st.plotly_chart(fig_timeline, use_container_width=True)
+        st.dataframe(summary.style.format({'Avg_Days': '{:.1f}', 'Avg_Return': '{:.2%}', 'Total_Return': '{:.2%}'}),
+                     use_container_width=True)
+
+    # --- INNOVATION SECTION: Transparent Brain (XAI) ---
+    st.markdown("---")
+    st.header("🧠 Transparent Brain (Explainable AI)")
+
+    features = attached_features(data)
+    if features is not None:
+        fig_shap = shap_figure(run_key, features, res_strat)
+
+        col_xai_1, col_xai_2 = st.columns([2, 1])
+        with col_xai_1:
+            st.subheader("Why did the AI choose this Regime?")
+            if fig_shap:
+                st.pyplot(fig_shap)
+        with col_xai_2:
+            st.info(f"**Current Regime:** {data['explanation']}")
+    else:
+        st.warning("Feature data missing for XAI.")
+
+    # --- INNOVATION SECTION: Crisis Lab ---
+    st.markdown("---")
+    st.header("🧪 Crisis Lab (Interactive Stress Test)")
+
+    if not res_strat.empty:
+        # CURRENT Allocation
+        crisis_lab(float(res_strat['Equity_Weight'].iloc[-1]), float(res_strat['Cash_Weight'].iloc[-1]))
+
 else:
     st.info("In the sidebar, select a ticker and date range, then click 'Run Simulation'.")
@@ -0,0 +1,21 @@
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+@pytest.fixture
+def make_prices():
+    """
+    Factory for a synthetic business-day price series (geometric random walk).
+    """
+    def factory(periods=300, start="2015-01-01", seed=0):
+        dates = pd.bdate_range(start, periods=periods)
+        rng = np.random.default_rng(seed)
+        return pd.Series(100 * np.exp(np.cumsum(rng.normal(0.0003, 0.012, periods))), index=dates)
+    return factory
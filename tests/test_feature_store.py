@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.core.data_loader import calculate_features
+from app.core.feature_store import FeatureStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FeatureStore(str(tmp_path))
+
+
+def test_publish_and_attach(store, make_prices):
+    prices = make_prices()
+    features = store.get_features("SPY", prices)
+
+    expected = calculate_features(prices)
+    np.testing.assert_allclose(features.to_numpy(), expected.to_numpy(dtype=float))
+    assert features.columns.tolist() == expected.columns.tolist()
+    # Attached frames are read-only views of the mapped file
+    assert not features.to_numpy().flags.writeable
+
+    again = store.attach("SPY")
+    assert again.index.equals(features.index)
+    assert [meta["version"] for meta in store.versions("SPY")] == [store.version_key(prices)]
+
+
+def test_extended_prices_replace_latest(store, make_prices):
+    prices = make_prices(periods=320)
+    store.get_features("SPY", prices.iloc[:300])
+    store.get_features("SPY", prices)
+
+    versions = store.versions("SPY")
+    assert [meta["version"] for meta in versions] == [store.version_key(prices)]
+    assert len(store.attach("SPY")) == len(calculate_features(prices))
+
+
+def test_shorter_range_keeps_latest(store, make_prices):
+    prices = make_prices(periods=320)
+    store.get_features("SPY", prices)
+    store.get_features("SPY", prices.iloc[:300])
+
+    assert len(store.versions("SPY")) == 2
+    assert len(store.attach("SPY")) == len(calculate_features(prices))
+
+
+def test_versions_ignores_pointer_files(store, make_prices):
+    store.get_features("SPY", make_prices())
+    ticker_dir = store._ticker_dir("SPY")
+    open(os.path.join(ticker_dir, "latest.json.abc.tmp"), "w").close()
+    os.makedirs(os.path.join(ticker_dir, ".tmp-abc"))
+
+    assert len(store.versions("SPY")) == 1
+
+
+def test_leftover_folder_is_republished(store, make_prices):
+    prices = make_prices()
+    # A version folder whose removal failed part-way: no meta.json
+    leftover = os.path.join(store._ticker_dir("SPY"), store.version_key(prices))
+    os.makedirs(leftover)
+    open(os.path.join(leftover, "values.npy"), "w").close()
+
+    features = store.get_features("SPY", prices)
+
+    assert not features.to_numpy().flags.writeable
+    assert store.attach("SPY", store.version_key(prices)) is not None
+
+
+def test_eviction_keeps_recent_versions(tmp_path, make_prices):
+    store = FeatureStore(str(tmp_path), max_versions=3)
+    for i in range(5):
+        # Different start dates, so none of these extends another
+        store.get_features("SPY", make_prices(start=f"201{i}-01-01", seed=i))
+
+    versions = store.versions("SPY")
+    assert len(versions) == 3
+    assert store.attach("SPY") is not None
+
+
+def test_invalidate(store, make_prices):
+    prices = make_prices()
+    store.get_features("SPY", prices)
+    store.invalidate("SPY", store.version_key(prices))
+
+    assert store.attach("SPY") is None
+    assert store.versions("SPY") == []
@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+from app.core.regime_segments import RegimeSegmentIndex, parse_date
+
+
+@pytest.fixture
+def results():
+    dates = pd.bdate_range("2021-01-04", periods=6, name='Date')
+    return pd.DataFrame({
+        'Value': [10100.0, 10200.0, 10000.0, 9900.0, 10300.0, 10400.0],
+        'Regime': ['Bullish', 'Bullish', 'Crash', 'Bullish', 'Bullish', 'Bullish'],
+    }, index=dates)
+
+
+def test_run_length_encoding(results):
+    segments = RegimeSegmentIndex.from_results(results)
+    df = segments.to_frame()
+
+    assert len(segments) == 3
+    assert df['Regime'].tolist() == ['Bullish', 'Crash', 'Bullish']
+    assert df['Days'].tolist() == [2, 1, 3]
+    assert df['Start'].iloc[1] == pd.Timestamp("2021-01-06")
+    assert df['End'].iloc[2] == pd.Timestamp("2021-01-11")
+
+
+def test_spell_returns_use_previous_close(results):
+    segments = RegimeSegmentIndex.from_results(results)
+
+    # First spell is measured from the starting capital, not its own first close
+    assert segments.returns[0] == pytest.approx(10200.0 / 10000.0 - 1)
+    assert segments.returns[1] == pytest.approx(10000.0 / 10200.0 - 1)
+    assert segments.returns[2] == pytest.approx(10400.0 / 10000.0 - 1)
+
+
+def test_regime_at(results):
+    segments = RegimeSegmentIndex.from_results(results)
+
+    assert segments.regime_at("2021-01-04") == 'Bullish'
+    assert segments.regime_at("2021-01-06") == 'Crash'
+    # Weekend falls inside the spell that started before it
+    assert segments.regime_at("2021-01-09") == 'Bullish'
+    assert segments.regime_at("2020-12-31") is None
+    assert segments.regime_at("2021-02-01") is None
+    assert segments.segment_at("2021-01-07")['Days'] == 3
+
+
+def test_summary_and_episodes(results):
+    segments = RegimeSegmentIndex.from_results(results)
+    summary = segments.summary().set_index('Regime')
+
+    assert summary.loc['Bullish', 'Spells'] == 2
+    assert summary.loc['Bullish', 'Days'] == 5
+    assert summary.loc['Crash', 'Spells'] == 1
+    # Compounding every spell reproduces the whole run
+    total = (1 + summary['Total_Return']).prod() - 1
+    assert total == pytest.approx(10400.0 / 10000.0 - 1)
+    assert len(segments.episodes('Crash')) == 1
+
+
+def test_empty_results():
+    segments = RegimeSegmentIndex.from_results(pd.DataFrame())
+
+    assert len(segments) == 0
+    assert segments.regime_at("2021-01-04") is None
+    assert segments.summary().empty
+
+
+@pytest.mark.parametrize("value", ["", "NaT", "not a date"])
+def test_invalid_dates_are_rejected(results, value):
+    segments = RegimeSegmentIndex.from_results(results)
+
+    with pytest.raises(ValueError):
+        parse_date(value)
+    with pytest.raises(ValueError):
+        segments.regime_at(value)
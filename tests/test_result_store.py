@@ -0,0 +1,127 @@
+import json
+import mmap
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.backtester import Backtester
+from app.core.data_loader import calculate_features
+from app.core.regime_segments import RegimeSegmentIndex
+from app.core.result_store import ResultStore
+
+
+def is_memory_mapped(arr):
+    while arr is not None:
+        if isinstance(arr, np.memmap) or isinstance(arr, mmap.mmap):
+            return True
+        arr = getattr(arr, "base", None)
+    return False
+
+
+@pytest.fixture
+def make_backtester(make_prices):
+    def factory(periods=800, seed=0):
+        prices = make_prices(periods=periods, seed=seed)
+        backtester = Backtester("TEST", str(prices.index[0].date()), str(prices.index[-1].date()))
+        backtester.data = prices
+        backtester.features = calculate_features(prices)
+        return backtester
+    return factory
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path))
+
+
+def test_round_trip_and_cache_hit(store, make_backtester):
+    backtester = make_backtester()
+    first = store.run_backtest(backtester)
+    second = store.run_backtest(backtester)
+
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["key"] == first["key"]
+    pd.testing.assert_frame_equal(second["results_strategy"], first["results_strategy"], check_freq=False, check_index_type=False)
+    pd.testing.assert_frame_equal(second["results_benchmark"], first["results_benchmark"], check_freq=False, check_index_type=False)
+    assert second["metrics_strategy"] == first["metrics_strategy"]
+
+
+def test_segments_are_stored_with_the_run(store, make_backtester):
+    backtester = make_backtester()
+    run = store.run_backtest(backtester)
+    expected = RegimeSegmentIndex.from_results(run["results_strategy"]).to_frame()
+
+    pd.testing.assert_frame_equal(run["segments"].to_frame(), expected)
+    stored = store.run_segments(backtester)
+    assert is_memory_mapped(stored.starts)
+    pd.testing.assert_frame_equal(stored.to_frame(), expected)
+    assert store.load(run["key"])["segments"].regime_at(expected["Start"].iloc[-1]) == expected["Regime"].iloc[-1]
+
+
+def test_loaded_columns_are_memory_mapped(store, make_backtester):
+    key = store.run_backtest(make_backtester())["key"]
+    frame = store.load(key)["results_strategy"]
+
+    assert is_memory_mapped(frame["Value"].to_numpy())
+
+
+def test_key_changes_with_parameters(store, make_backtester):
+    backtester = make_backtester()
+    key = store.run_key(backtester)
+    backtester.risk_manager.target_vol = 0.10
+
+    assert store.run_key(backtester) != key
+
+
+def test_missing_array_is_a_cache_miss(store, make_backtester):
+    key = store.run_backtest(make_backtester())["key"]
+    os.remove(os.path.join(store.arrays_dir, key, "benchmark_Value.npy"))
+
+    assert store.load(key) is None
+    # The damaged run is dropped, not listed, and republished on the next run
+    assert key not in store.list_runs()["key"].tolist()
+    assert store.run_backtest(make_backtester())["cached"] is False
+    assert store.run_backtest(make_backtester())["cached"] is True
+    assert os.path.exists(os.path.join(store.arrays_dir, key, "benchmark_Value.npy"))
+
+
+def test_leftover_folder_is_replaced(store, make_backtester):
+    backtester = make_backtester()
+    key = store.run_key(backtester)
+    # A damaged folder that could not be removed, with no row pointing at it
+    os.makedirs(os.path.join(store.arrays_dir, key))
+    open(os.path.join(store.arrays_dir, key, "strategy_Value.npy"), "w").close()
+
+    assert store.run_backtest(backtester)["cached"] is False
+    assert store.run_backtest(backtester)["cached"] is True
+
+
+def test_lost_publish_race_keeps_existing_run(store, make_backtester):
+    backtester = make_backtester()
+    run = store.run_backtest(backtester)
+    store.set_explanation(run["key"], "first writer")
+
+    store.save(run["key"], backtester, run["results_strategy"], run["results_benchmark"],
+               run["metrics_strategy"], run["metrics_benchmark"])
+
+    assert store.load(run["key"])["explanation"] == "first writer"
+    assert not [name for name in os.listdir(store.arrays_dir) if name.startswith(".tmp-")]
+
+
+def test_short_run_is_stored_and_listed(store, make_backtester):
+    # Shorter than the 200-day warm-up: no results, no metrics
+    run = store.run_backtest(make_backtester(periods=300))
+    again = store.run_backtest(make_backtester(periods=300))
+
+    assert run["results_strategy"].empty
+    assert again["cached"] is True
+    assert again["results_strategy"].empty
+
+    store.run_backtest(make_backtester(seed=1))
+    runs = store.list_runs().to_dict(orient='records')
+    json.dumps(runs, allow_nan=False)
+    assert len(runs) == 2
+    json.dumps(store.compare([r["key"] for r in runs]).to_dict(orient='records'), allow_nan=False)